@@ -1,42 +1,72 @@
 #! /usr/bin/env python
 
 import argparse
+import collections
+import concurrent.futures
+import hashlib
+import multiprocessing
+import os
 import sys
+import timeit
 
-g_flow_rates = []
-g_start_valve_id = None
+import numpy as np
+
+# The solver used by a worker process in the parallel search.
+g_worker_solver = None
+
+# Bits for each small argument in a packed `memoize()` key.
+KEY_BITS = 16
+
+# Best next moves stored in the low bits of `calc_path_and_pressure()` results.
+MOVE_BITS = 16
+MOVE_END = 0
+MOVE_RESTART = 1
+MOVE_IDLE = 2
+MOVE_OPEN = 3
+MOVE_TRAVEL = 4
 
 
 def main(args):
     """
     The main function entrypoint.
     """
-    global g_flow_rates
-    global g_start_valve_id
-
+    timings = {}
+    phase_start = timeit.default_timer()
     valves = list(parse_valves(args.infile))
-    flow_rate_map = {}
     for label, flow_rate, connections in valves:
         print("Valve {}, flow rate: {}".format(label, flow_rate))
         for connection in connections:
             print("  - Connects to {}".format(connection))
-        flow_rate_map[label] = flow_rate
-        g_flow_rates.append(flow_rate)
     valve_labels, valve_map, adj_matrix = create_adj_matrix(valves)
-    g_start_valve_id = valve_map["AA"]
-    curr_valve_id = g_start_valve_id
-    open_valve_ids = 0x00
+    timings["parse"] = timeit.default_timer() - phase_start
+    solver = ValveSolver(
+        valve_labels=valve_labels,
+        flow_rates=[flow_rate for _, flow_rate, _ in valves],
+        adj_matrix=adj_matrix,
+        start_valve_id=valve_map["AA"],
+        collect_stats=args.stats,
+    )
+    curr_valve_id = solver.start_valve_id
+    open_valve_ids = solver.get_initial_open_valve_ids()
     for valve_id, label in enumerate(valve_labels):
         print("{}: {}".format(label, valve_id))
-    for valve_id, flow_rate in enumerate(g_flow_rates):
-        if flow_rate == 0:
-            open_valve_ids = open_valve_ids | (0x01 << valve_id)
     print("open valves:", bin(open_valve_ids))
+    agents = args.agents
+    if agents is None:
+        agents = 2 if args.elephant else 1
     max_time = 30
-    other_players = 0
-    if args.elephant:
+    other_players = agents - 1
+    if other_players > 0:
         max_time = 26
-        other_players = 1
+    if agents > 2:
+        # The other searches run the agents one after another, which is
+        # exponential in the number of agents.
+        other_solver = args.bound or args.compress or args.dp
+        if other_solver or args.workers is not None:
+            print("Using --disjoint for {} agents.".format(agents))
+        args.disjoint = True
+        args.bound = args.compress = args.dp = False
+        args.workers = None
     time = 1
 
     def get_label(vid):
@@ -45,121 +75,861 @@ def main(args):
             label += "*"
         return label
 
-    pressure, path, open_valve_ids = calc_path_and_pressure(
-        adj_matrix=adj_matrix,
-        max_time=max_time,
-        time=time,
-        curr_valve_id=curr_valve_id,
-        open_valve_ids=open_valve_ids,
-        other_players=other_players,
-    )
-    labels = [get_label(vid) for vid in path]
+    phase_start = timeit.default_timer()
+    relevant_ids = solver.relevant_ids
+    compressed = args.bound or args.workers is not None
+    compressed = compressed or args.disjoint or args.compress
+    if compressed:
+        solver.calc_distances()
+    if compressed or args.dp:
+        print("Relevant valves:", [valve_labels[vid] for vid in relevant_ids])
+    timings["preprocess"] = timeit.default_timer() - phase_start
+
+    phase_start = timeit.default_timer()
+    if args.bound or args.workers is not None:
+        search_stats = collections.Counter()
+        if args.workers is not None:
+            pressure, path, open_valve_ids = solver.calc_pressure_parallel(
+                max_time=max_time,
+                open_valve_ids=open_valve_ids,
+                other_players=other_players,
+                search_stats=search_stats,
+                workers=args.workers,
+                split_depth=args.split_depth,
+            )
+        else:
+            pressure, path, open_valve_ids = solver.calc_pressure_bnb(
+                max_time=max_time,
+                open_valve_ids=open_valve_ids,
+                other_players=other_players,
+                search_stats=search_stats,
+            )
+        path = (curr_valve_id,) + path
+        labels = [get_compressed_label(valve_labels, vid) for vid in path]
+        print("Expanded nodes:", search_stats["expanded"])
+        print("Pruned nodes:", search_stats["pruned"])
+        solver.stats["pruned"] += search_stats["pruned"]
+    elif args.disjoint:
+        mask_pressures = None
+        if args.cache_dir is not None:
+            cache_path = get_cache_path(args.cache_dir, valves, max_time, agents)
+            mask_pressures = load_mask_pressures(cache_path)
+        if mask_pressures is None:
+            mask_pressures = solver.calc_mask_pressures(max_time=max_time)
+            if args.cache_dir is not None:
+                save_mask_pressures(cache_path, mask_pressures)
+        else:
+            print("Loaded mask pressures from {}.".format(cache_path))
+        subset_pressures = subset_max_transform(mask_pressures)
+        if other_players > 0:
+            pressure, player_masks = best_partition(
+                mask_pressures, subset_pressures, other_players + 1
+            )
+        else:
+            best_mask = int(subset_pressures.argmax())
+            pressure, player_masks = int(subset_pressures[best_mask]), (best_mask,)
+        for player, mask in enumerate(player_masks):
+            mask = find_subset_mask(mask_pressures, mask, subset_pressures[mask])
+            player_ids = mask_to_valve_ids(relevant_ids, mask)
+            print(
+                "Player {} opens:".format(player + 1),
+                [valve_labels[vid] for vid in player_ids],
+            )
+            for valve_id in player_ids:
+                open_valve_ids |= 0x01 << valve_id
+        labels = None
+    elif args.dp:
+        pressure, open_valve_ids, _ = solver.calc_pressure_dp(
+            max_time=max_time,
+            open_valve_ids=open_valve_ids,
+            other_players=other_players,
+            two_layers=args.two_layers,
+        )
+        labels = None
+    elif args.compress:
+        pressure, path, open_valve_ids = solver.calc_compressed_pressure(
+            max_time=max_time,
+            time=time,
+            curr_valve_id=curr_valve_id,
+            open_valve_ids=open_valve_ids,
+            other_players=other_players,
+        )
+        path = (curr_valve_id,) + path
+        labels = [get_compressed_label(valve_labels, vid) for vid in path]
+    else:
+        result = solver.calc_path_and_pressure(
+            max_time=max_time,
+            time=time,
+            curr_valve_id=curr_valve_id,
+            open_valve_ids=open_valve_ids,
+            other_players=other_players,
+        )
+        pressure = result >> MOVE_BITS
+        path, open_valve_ids = solver.trace_path(
+            max_time=max_time,
+            open_valve_ids=open_valve_ids,
+            other_players=other_players,
+        )
+        labels = [get_label(vid) for vid in path]
+    timings["search"] = timeit.default_timer() - phase_start
+    solver.clear_cache()
     print("Max. pressure:", pressure)
-    print("Path:", labels)
+    if labels is not None:
+        print("Path:", labels)
     print("open valves:", bin(open_valve_ids))
+    if args.stats:
+        print_stats(solver, timings)
+
+
+def print_stats(solver, timings):
+    """
+    Print the search statistics collected by `solver`.
+    """
+    stats = solver.stats
+    print("")
+    print("Search statistics")
+    print("-----------------")
+    print("")
+    print("- States expanded: {}".format(sum(solver.time_nodes.values())))
+    if stats["pruned"] > 0:
+        print("- States pruned: {}".format(stats["pruned"]))
+    lookups = stats["cache_hits"] + stats["cache_misses"]
+    if lookups > 0:
+        print("- Cache hits: {}".format(stats["cache_hits"]))
+        print("- Cache misses: {}".format(stats["cache_misses"]))
+        print("- Cache hit ratio: {:.3f}".format(stats["cache_hits"] / lookups))
+        print("- Peak cache size: {}".format(stats["peak_cache_size"]))
+    print("- Branching factor by time:")
+    for time in sorted(solver.time_nodes):
+        nodes = solver.time_nodes[time]
+        print(
+            "  - {:3d}: {:10d} states, {:6.2f} children/state".format(
+                time, nodes, solver.time_children[time] / nodes
+            )
+        )
+    for phase, seconds in timings.items():
+        print("- Time to {}: {:.3f}s".format(phase, seconds))
+    print("")
 
 
 def memoize(f):
+    """
+    Memoize a `ValveSolver` method in a cache owned by the solver.
+    """
 
-    cache = {}
-    arg_names = ["time", "curr_valve_id", "open_valve_ids", "other_players"]
+    arg_names = ["open_valve_ids", "max_time", "time", "curr_valve_id", "other_players"]
 
-    def _inner(**kwds):
-        key = tuple(kwds[arg_name] for arg_name in arg_names)
+    def _inner(self, **kwds):
+        cache = self.caches.get(f.__name__)
+        if cache is None:
+            cache = self.caches[f.__name__] = {}
+        # Pack the key into a single int; it is much smaller than a tuple.
+        key = 0
+        for arg_name in arg_names:
+            key = (key << KEY_BITS) | kwds[arg_name]
         result = cache.get(key)
         if result is None:
-            result = f(**kwds)
+            result = f(self, **kwds)
             cache[key] = result
+            if self.collect_stats:
+                self.stats["cache_misses"] += 1
+                self.stats["peak_cache_size"] = max(
+                    self.stats["peak_cache_size"], len(cache)
+                )
+        elif self.collect_stats:
+            self.stats["cache_hits"] += 1
         return result
 
     return _inner
 
 
-@memoize
-def calc_path_and_pressure(
-    adj_matrix, max_time, time, curr_valve_id, open_valve_ids, other_players
-):
+class ValveSolver:
     """
-    Calculate the pressure released.
+    Solver for a single network of valves.
+    The solver owns the flow rates, graph, start valve, and search caches, so
+    any number of networks can be solved in the same process.
     """
-    global g_flow_rates
-    valve_count = len(adj_matrix)
 
-    # Maximum time
-    if time == max_time:
-        if other_players > 0:
-            return calc_path_and_pressure(
-                adj_matrix=adj_matrix,
+    def __init__(
+        self, valve_labels, flow_rates, adj_matrix, start_valve_id, collect_stats=False
+    ):
+        self.valve_labels = valve_labels
+        self.flow_rates = tuple(flow_rates)
+        self.adj_matrix = adj_matrix
+        self.start_valve_id = start_valve_id
+        self.relevant_ids = tuple(
+            valve_id for valve_id, flow_rate in enumerate(flow_rates) if flow_rate > 0
+        )
+        self.dist_matrix = None
+        self.collect_stats = collect_stats
+        self.stats = collections.Counter()
+        self.time_nodes = collections.Counter()
+        self.time_children = collections.Counter()
+        self.caches = {}
+        self.shared_best = None
+
+    def __getstate__(self):
+        """
+        Don't send the caches to worker processes.
+        """
+        state = dict(self.__dict__)
+        state["caches"] = {}
+        return state
+
+    def clear_cache(self):
+        """
+        Free the memoized search results.
+        """
+        self.caches.clear()
+
+    def get_initial_open_valve_ids(self):
+        """
+        Valves with no flow are treated as already open.
+        """
+        open_valve_ids = 0x00
+        for valve_id, flow_rate in enumerate(self.flow_rates):
+            if flow_rate == 0:
+                open_valve_ids = open_valve_ids | (0x01 << valve_id)
+        return open_valve_ids
+
+    def calc_distances(self):
+        """
+        Calculate the shortest distances between the valves once.
+        """
+        if self.dist_matrix is None:
+            self.dist_matrix = calc_distances(self.adj_matrix)
+        return self.dist_matrix
+
+    def record_expansion(self, time, children):
+        """
+        Record the expansion of a search state at `time` into `children`
+        states.
+        """
+        if self.collect_stats:
+            self.time_nodes[time] += 1
+            self.time_children[time] += children
+
+    @memoize
+    def calc_path_and_pressure(
+        self, max_time, time, curr_valve_id, open_valve_ids, other_players
+    ):
+        """
+        Calculate the pressure released.
+        Returns the pressure and the best next move packed into a single int
+        (see `pack_result()`).  The path is rebuilt afterwards by
+        `trace_path()`.
+        """
+        adj_matrix = self.adj_matrix
+        valve_count = len(adj_matrix)
+
+        # Maximum time
+        if time == max_time:
+            if other_players > 0:
+                self.record_expansion(time, 1)
+                result = self.calc_path_and_pressure(
+                    max_time=max_time,
+                    time=1,
+                    curr_valve_id=self.start_valve_id,
+                    open_valve_ids=open_valve_ids,
+                    other_players=other_players - 1,
+                )
+                return pack_result(result >> MOVE_BITS, MOVE_RESTART)
+            else:
+                return pack_result(0, MOVE_END)
+        # If all valves open, stay still.
+        full_set = (0x01 << (valve_count)) - 1
+        if open_valve_ids == full_set:
+            return pack_result(0, MOVE_IDLE)
+
+        max_result = pack_result(-1, MOVE_END)
+        children = 0
+        # Path where we open this valve.
+        current_closed = (open_valve_ids & (0x01 << curr_valve_id)) == 0x00
+        if current_closed:
+            children += 1
+            new_open_ids = open_valve_ids | (0x01 << curr_valve_id)
+            pressure = self.flow_rates[curr_valve_id] * (max_time - time)
+            result = self.calc_path_and_pressure(
                 max_time=max_time,
-                time=1,
-                curr_valve_id=g_start_valve_id,
+                time=time + 1,
+                curr_valve_id=curr_valve_id,
+                open_valve_ids=new_open_ids,
+                other_players=other_players,
+            )
+            max_result = pack_result(pressure + (result >> MOVE_BITS), MOVE_OPEN)
+
+        # Travel to adjacent valves.
+        row = adj_matrix[curr_valve_id]
+        for valve_id, adj_flag in enumerate(row):
+            if valve_id == curr_valve_id:
+                continue
+            adj_flag = bool(adj_flag == 1)
+            if adj_flag:
+                children += 1
+                result = self.calc_path_and_pressure(
+                    max_time=max_time,
+                    time=time + 1,
+                    curr_valve_id=valve_id,
+                    open_valve_ids=open_valve_ids,
+                    other_players=other_players,
+                )
+                # Pick the result with the maximum pressure.
+                if (result >> MOVE_BITS) > (max_result >> MOVE_BITS):
+                    max_result = pack_result(
+                        result >> MOVE_BITS, MOVE_TRAVEL + valve_id
+                    )
+        self.record_expansion(time, children)
+        return max_result
+
+    def trace_path(self, max_time, open_valve_ids, other_players):
+        """
+        Rebuild the path found by `calc_path_and_pressure()` by following the
+        best moves stored in its cache.
+        Returns (path, open_valve_ids).
+        """
+        path = []
+        time = 1
+        curr_valve_id = self.start_valve_id
+        while True:
+            result = self.calc_path_and_pressure(
+                max_time=max_time,
+                time=time,
+                curr_valve_id=curr_valve_id,
                 open_valve_ids=open_valve_ids,
-                other_players=other_players - 1,
+                other_players=other_players,
             )
-        else:
-            return 0, (curr_valve_id,), open_valve_ids
-    # If all valves open, stay still.
-    full_set = (0x01 << (valve_count)) - 1
-    if open_valve_ids == full_set:
-        return (
-            0,
-            tuple([curr_valve_id] * (max_time - time)),
-            open_valve_ids,
-        )
+            move = result & ((0x01 << MOVE_BITS) - 1)
+            if move == MOVE_END:
+                path.append(curr_valve_id)
+                break
+            elif move == MOVE_IDLE:
+                path.extend([curr_valve_id] * (max_time - time))
+                break
+            elif move == MOVE_RESTART:
+                time = 1
+                curr_valve_id = self.start_valve_id
+                other_players -= 1
+                continue
+            elif move == MOVE_OPEN:
+                path.append(-curr_valve_id)
+                open_valve_ids |= 0x01 << curr_valve_id
+            else:
+                path.append(curr_valve_id)
+                curr_valve_id = move - MOVE_TRAVEL
+            time += 1
+        return tuple(path), open_valve_ids
 
-    results = []
-    # Path where we open this valve.
-    current_closed = (open_valve_ids & (0x01 << curr_valve_id)) == 0x00
-    if current_closed:
-        new_open_ids = open_valve_ids | (0x01 << curr_valve_id)
-        pressure = g_flow_rates[curr_valve_id] * (max_time - time)
-        future_pressure, future_path, future_open_ids = calc_path_and_pressure(
-            adj_matrix=adj_matrix,
-            max_time=max_time,
-            time=time + 1,
-            curr_valve_id=curr_valve_id,
-            open_valve_ids=new_open_ids,
-            other_players=other_players,
-        )
-        results.append(
-            (
-                (
+    @memoize
+    def calc_compressed_pressure(
+        self, max_time, time, curr_valve_id, open_valve_ids, other_players
+    ):
+        """
+        Calculate the pressure released by jumping directly between the valves
+        that have a positive flow rate.
+        Each jump costs the shortest distance to the next valve plus 1 minute
+        to open it.
+        The path lists the valves visited; opened valves are stored as
+        `~valve_id`.
+        """
+        # Option where this player stops and the next one takes over.
+        max_result = (0, (), open_valve_ids)
+        children = 0
+        if other_players > 0:
+            children += 1
+            future_pressure, future_path, future_open_ids = (
+                self.calc_compressed_pressure(
+                    max_time=max_time,
+                    time=1,
+                    curr_valve_id=self.start_valve_id,
+                    open_valve_ids=open_valve_ids,
+                    other_players=other_players - 1,
+                )
+            )
+            max_result = (
+                future_pressure,
+                (self.start_valve_id,) + future_path,
+                future_open_ids,
+            )
+
+        row = self.dist_matrix[curr_valve_id]
+        for valve_id in self.relevant_ids:
+            if (open_valve_ids & (0x01 << valve_id)) != 0x00:
+                continue
+            open_time = time + row[valve_id]
+            if open_time >= max_time:
+                continue
+            pressure = self.flow_rates[valve_id] * (max_time - open_time)
+            children += 1
+            future_pressure, future_path, future_open_ids = (
+                self.calc_compressed_pressure(
+                    max_time=max_time,
+                    time=open_time + 1,
+                    curr_valve_id=valve_id,
+                    open_valve_ids=open_valve_ids | (0x01 << valve_id),
+                    other_players=other_players,
+                )
+            )
+            if pressure + future_pressure > max_result[0]:
+                max_result = (
                     pressure + future_pressure,
-                    future_path,
+                    (~valve_id,) + future_path,
                     future_open_ids,
-                ),
-                True,
-            )
+                )
+        self.record_expansion(time, children)
+        return max_result
+
+    def calc_pressure_dp(
+        self, max_time, open_valve_ids, other_players, two_layers=False
+    ):
+        """
+        Calculate the pressure released with a bottom-up DP.
+        The table is indexed by `time x valve x mask`, where the mask only has
+        bits for the relevant valves.  Each cell holds the most pressure that
+        can be released by reaching that state, or -1 if it can't be reached.
+        The table is filled forward one minute at a time.
+        Each additional player starts over from the start valve with the masks
+        the previous player finished with.
+        If `two_layers` is set, only the current and next minute are kept.
+        Returns (pressure, open_valve_ids, mask_pressures).
+        """
+        relevant_ids = self.relevant_ids
+        valve_count = len(self.adj_matrix)
+        mask_count = 0x01 << len(relevant_ids)
+        masks = np.arange(mask_count)
+        neighbors = [
+            [valve_id for valve_id, dist in enumerate(row) if dist == 1]
+            for row in self.adj_matrix
+        ]
+        mask_pressures = np.full(mask_count, -1, dtype=np.int32)
+        mask_pressures[0] = 0
+        for _ in range(other_players + 1):
+            if two_layers:
+                layer = np.full((valve_count, mask_count), -1, dtype=np.int32)
+            else:
+                table = np.full(
+                    (max_time + 1, valve_count, mask_count), -1, dtype=np.int32
+                )
+                layer = table[1]
+            layer[self.start_valve_id] = mask_pressures
+            for time in range(1, max_time):
+                if two_layers:
+                    next_layer = np.full((valve_count, mask_count), -1, dtype=np.int32)
+                else:
+                    next_layer = table[time + 1]
+                # Travel to adjacent valves.
+                for valve_id, valve_neighbors in enumerate(neighbors):
+                    np.max(layer[valve_neighbors], axis=0, out=next_layer[valve_id])
+                # Open a valve.
+                for bit, valve_id in enumerate(relevant_ids):
+                    closed = masks[(masks & (0x01 << bit)) == 0]
+                    before = layer[valve_id, closed]
+                    pressure = self.flow_rates[valve_id] * (max_time - time)
+                    after = np.where(before >= 0, before + pressure, -1)
+                    opened = closed | (0x01 << bit)
+                    np.maximum(next_layer[valve_id, opened], after, out=after)
+                    next_layer[valve_id, opened] = after
+                if self.collect_stats:
+                    self.time_nodes[time] += int(np.count_nonzero(layer >= 0))
+                    self.time_children[time] += int(np.count_nonzero(next_layer >= 0))
+                layer = next_layer
+            mask_pressures = layer.max(axis=0)
+        best_mask = int(mask_pressures.argmax())
+        for bit, valve_id in enumerate(relevant_ids):
+            if best_mask & (0x01 << bit):
+                open_valve_ids |= 0x01 << valve_id
+        return int(mask_pressures[best_mask]), open_valve_ids, mask_pressures
+
+    def calc_pressure_bnb(
+        self, max_time, open_valve_ids, other_players, search_stats, state=None
+    ):
+        """
+        Calculate the pressure released with a depth-first branch-and-bound
+        search between the relevant valves.
+        A branch is cut when the pressure released so far plus an optimistic
+        bound for the closed valves can't beat the best answer found so far.
+        The number of expanded and pruned nodes is counted in `search_stats`.
+        The search starts from `state` if given, otherwise from the start
+        valve.
+        If `shared_best` is set, it is a shared value holding the best pressure
+        found by any process.
+        Returns (pressure, path, open_valve_ids).
+        """
+        flow_rates = self.flow_rates
+        relevant_ids = self.relevant_ids
+        dist_matrix = self.dist_matrix
+        shared_best = self.shared_best
+        flow_order = sorted(relevant_ids, key=lambda vid: -flow_rates[vid])
+        hop_time = 1 + min(
+            (dist_matrix[vid0][vid1] for vid0 in relevant_ids for vid1 in relevant_ids),
+            key=lambda dist: dist if dist > 0 else sys.maxsize,
+            default=0,
         )
+        start_row = dist_matrix[self.start_valve_id]
+        best = (0, (), open_valve_ids)
+        if state is None:
+            state = (1, self.start_valve_id, open_valve_ids, 0, other_players, ())
 
-    # Travel to adjacent valves.
-    row = adj_matrix[curr_valve_id]
-    for valve_id, adj_flag in enumerate(row):
-        if valve_id == curr_valve_id:
-            continue
-        adj_flag = bool(adj_flag == 1)
-        if adj_flag:
-            result = calc_path_and_pressure(
-                adj_matrix=adj_matrix,
-                max_time=max_time,
-                time=time + 1,
-                curr_valve_id=valve_id,
-                open_valve_ids=open_valve_ids,
-                other_players=other_players,
+        def calc_bound(time, curr_valve_id, open_ids, players):
+            """
+            Pair the closed valves, highest flow first, with the earliest
+            minutes any player could possibly open a valve.
+            """
+            closed_rates = [
+                flow_rates[vid] for vid in flow_order if (open_ids & (0x01 << vid)) == 0
+            ]
+            if len(closed_rates) == 0:
+                return 0
+            row = dist_matrix[curr_valve_id]
+            slots = []
+            starts = [time + min(row[vid] for vid in relevant_ids)]
+            starts.extend([1 + min(start_row[vid] for vid in relevant_ids)] * players)
+            for open_time in starts:
+                for _ in closed_rates:
+                    if open_time >= max_time:
+                        break
+                    slots.append(max_time - open_time)
+                    open_time += hop_time
+            slots.sort(reverse=True)
+            return sum(rate * slot for rate, slot in zip(closed_rates, slots))
+
+        def search(state):
+            nonlocal best
+            time, curr_valve_id, open_ids, pressure, players, path = state
+            incumbent = best[0]
+            if shared_best is not None:
+                incumbent = max(incumbent, shared_best.value)
+            bound = calc_bound(time, curr_valve_id, open_ids, players)
+            if pressure + bound <= incumbent:
+                search_stats["pruned"] += 1
+                return
+            search_stats["expanded"] += 1
+            if pressure > best[0]:
+                best = (pressure, path, open_ids)
+                if shared_best is not None:
+                    with shared_best.get_lock():
+                        if pressure > shared_best.value:
+                            shared_best.value = pressure
+            next_states = self.get_bnb_moves(max_time, state)
+            self.record_expansion(time, len(next_states))
+            for next_state in next_states:
+                search(next_state)
+
+        search(state)
+        return best
+
+    def get_bnb_moves(self, max_time, state):
+        """
+        Return the states that follow `state` in the branch-and-bound search.
+        A state is (time, curr_valve_id, open_valve_ids, pressure, players,
+        path).
+        """
+        time, curr_valve_id, open_ids, pressure, players, path = state
+        row = self.dist_matrix[curr_valve_id]
+        moves = []
+        for valve_id in self.relevant_ids:
+            if (open_ids & (0x01 << valve_id)) != 0x00:
+                continue
+            open_time = time + row[valve_id]
+            if open_time >= max_time:
+                continue
+            moves.append((self.flow_rates[valve_id] * (max_time - open_time), valve_id))
+        # Try the most promising valves first to find a good answer early.
+        moves.sort(reverse=True)
+        next_states = [
+            (
+                time + row[valve_id] + 1,
+                valve_id,
+                open_ids | (0x01 << valve_id),
+                pressure + valve_pressure,
+                players,
+                path + (~valve_id,),
             )
-            results.append((result, False))
-    # Pick the result with the maximum pressure.
-    max_result = ((-1, None, None), False)
-    for result, opened_valve in results:
-        future_pressure, _, _ = result
-        if future_pressure > max_result[0][0]:
-            max_result = (result, opened_valve)
-    (future_pressure, future_path, future_open_ids), opened_valve = max_result
-    if opened_valve:
-        valve_id = -curr_valve_id
-    else:
-        valve_id = curr_valve_id
-    return future_pressure, (valve_id,) + future_path, future_open_ids
+            for valve_pressure, valve_id in moves
+        ]
+        if players > 0:
+            next_states.append(
+                (
+                    1,
+                    self.start_valve_id,
+                    open_ids,
+                    pressure,
+                    players - 1,
+                    path + (self.start_valve_id,),
+                )
+            )
+        return next_states
+
+    def calc_pressure_parallel(
+        self,
+        max_time,
+        open_valve_ids,
+        other_players,
+        search_stats,
+        workers,
+        split_depth=2,
+    ):
+        """
+        Run the branch-and-bound search on a process pool.
+        The search is split into subtrees after the first `split_depth`
+        decisions from the start valve.  The workers share the best pressure
+        found so far so they can prune each other's branches.
+        Returns (pressure, path, open_valve_ids).
+        """
+        state = (1, self.start_valve_id, open_valve_ids, 0, other_players, ())
+        states = [state]
+        for _ in range(split_depth):
+            next_states = []
+            for state in states:
+                moves = self.get_bnb_moves(max_time, state)
+                if len(moves) == 0:
+                    next_states.append(state)
+                next_states.extend(moves)
+            states = next_states
+        print("Subtrees:", len(states))
+        self.shared_best = multiprocessing.Value("i", 0)
+        best = (0, (), open_valve_ids)
+        try:
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers, initializer=init_worker, initargs=(self,)
+            ) as executor:
+                futures = [
+                    executor.submit(
+                        run_bnb_subtree, max_time, open_valve_ids, other_players, state
+                    )
+                    for state in states
+                ]
+                for future in futures:
+                    result, subtree_stats, time_nodes, time_children = future.result()
+                    search_stats.update(subtree_stats)
+                    self.time_nodes.update(time_nodes)
+                    self.time_children.update(time_children)
+                    if result[0] > best[0]:
+                        best = result
+        finally:
+            self.shared_best = None
+        return best
+
+    def calc_mask_pressures(self, max_time):
+        """
+        Search every route a single player can take between the relevant
+        valves and record the most pressure released for each set of opened
+        valves.
+        Masks only have bits for the relevant valves.
+        Returns an array of pressures indexed by mask.
+        """
+        relevant_ids = self.relevant_ids
+        mask_pressures = np.zeros(0x01 << len(relevant_ids), dtype=np.int32)
+        stack = [(1, self.start_valve_id, 0x00, 0)]
+        while stack:
+            time, curr_valve_id, mask, pressure = stack.pop()
+            if pressure > mask_pressures[mask]:
+                mask_pressures[mask] = pressure
+            row = self.dist_matrix[curr_valve_id]
+            children = 0
+            for bit, valve_id in enumerate(relevant_ids):
+                if (mask & (0x01 << bit)) != 0x00:
+                    continue
+                open_time = time + row[valve_id]
+                if open_time >= max_time:
+                    continue
+                children += 1
+                stack.append(
+                    (
+                        open_time + 1,
+                        valve_id,
+                        mask | (0x01 << bit),
+                        pressure + self.flow_rates[valve_id] * (max_time - open_time),
+                    )
+                )
+            self.record_expansion(time, children)
+        return mask_pressures
+
+
+def pack_result(pressure, move):
+    """
+    Pack a pressure and the best next move into a single int.
+    The move is one of the `MOVE_*` codes, or `MOVE_TRAVEL + valve_id`.
+    """
+    return (pressure << MOVE_BITS) | move
+
+
+def init_worker(solver):
+    """
+    Set the solver used by a worker process.
+    """
+    global g_worker_solver
+    g_worker_solver = solver
+
+
+def run_bnb_subtree(max_time, open_valve_ids, other_players, state):
+    """
+    Search a single subtree in a worker process.
+    Returns (result, search_stats, time_nodes, time_children).
+    """
+    solver = g_worker_solver
+    solver.time_nodes.clear()
+    solver.time_children.clear()
+    search_stats = collections.Counter()
+    result = solver.calc_pressure_bnb(
+        max_time=max_time,
+        open_valve_ids=open_valve_ids,
+        other_players=other_players,
+        search_stats=search_stats,
+        state=state,
+    )
+    return result, search_stats, solver.time_nodes, solver.time_children
+
+
+def get_cache_path(cache_dir, valves, max_time, agents):
+    """
+    Get the path of the on-disk mask pressure table for a set of parsed
+    valves, time limit, and agent count.
+    """
+    key = repr((valves, max_time, agents)).encode("utf-8")
+    digest = hashlib.sha256(key).hexdigest()
+    return os.path.join(cache_dir, "day16-{}.npz".format(digest))
+
+
+def load_mask_pressures(cache_path):
+    """
+    Load a mask pressure table from disk.
+    Returns None if it hasn't been saved yet.
+    """
+    if not os.path.exists(cache_path):
+        return None
+    with np.load(cache_path) as data:
+        return data["mask_pressures"]
+
+
+def save_mask_pressures(cache_path, mask_pressures):
+    """
+    Save a mask pressure table to disk.
+    """
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    np.savez_compressed(cache_path, mask_pressures=mask_pressures)
+
+
+def subset_max_transform(mask_pressures):
+    """
+    Transform a table indexed by mask so each entry holds the maximum over all
+    the subsets of that mask.
+    """
+    subset_pressures = mask_pressures.copy()
+    mask_count = len(subset_pressures)
+    bit = 0x01
+    while bit < mask_count:
+        view = subset_pressures.reshape(-1, 2, bit)
+        np.maximum(view[:, 1, :], view[:, 0, :], out=view[:, 1, :])
+        bit <<= 1
+    return subset_pressures
+
+
+def best_disjoint_pair(subset_pressures, other_pressures):
+    """
+    Find the pair of disjoint masks with the highest combined pressure.
+    Both tables must already hold the best pressure over all the subsets of
+    each mask, so it is enough to pair each mask with its complement.
+    Returns (pressure, (mask0, mask1)).
+    """
+    mask_count = len(subset_pressures)
+    masks = np.arange(mask_count)
+    combined = subset_pressures + other_pressures[masks ^ (mask_count - 1)]
+    mask = int(combined.argmax())
+    return int(combined[mask]), (mask, mask ^ (mask_count - 1))
+
+
+def best_partition(mask_pressures, subset_pressures, agents):
+    """
+    Split the relevant valves into `agents` disjoint masks with the highest
+    combined pressure.
+    Each extra agent adds a layer where every mask holds the best pressure
+    that one more agent can add to the layer below.  Only the masks a single
+    agent can actually reach are tried as that agent's share.
+    The last agent is paired with the complement like
+    `best_disjoint_pair()`.
+    Returns (pressure, masks).
+    """
+    mask_count = len(mask_pressures)
+    masks = np.arange(mask_count)
+    reachable = np.flatnonzero(mask_pressures > 0)
+    layer = subset_pressures
+    choices = []
+    for _ in range(agents - 2):
+        next_layer = layer.copy()
+        choice = np.zeros(mask_count, dtype=np.int64)
+        for mask in reachable:
+            supersets = masks[(masks & mask) == mask]
+            combined = mask_pressures[mask] + layer[supersets ^ mask]
+            better = combined > next_layer[supersets]
+            next_layer[supersets[better]] = combined[better]
+            choice[supersets[better]] = mask
+        layer = next_layer
+        choices.append(choice)
+    pressure, (mask, rest) = best_disjoint_pair(subset_pressures, layer)
+    player_masks = [mask]
+    for choice in reversed(choices):
+        mask = int(choice[rest])
+        player_masks.append(mask)
+        rest ^= mask
+    player_masks.append(rest)
+    return pressure, tuple(player_masks)
+
+
+def find_subset_mask(mask_pressures, mask, pressure):
+    """
+    Find a subset of `mask` whose entry in `mask_pressures` is `pressure`.
+    This recovers the valves actually opened for a subset-max transformed
+    entry.
+    """
+    masks = np.arange(len(mask_pressures))
+    candidates = (masks & ~mask) == 0
+    candidates &= mask_pressures == pressure
+    return int(np.flatnonzero(candidates)[0])
+
+
+def mask_to_valve_ids(relevant_ids, mask):
+    """
+    Convert a mask over `relevant_ids` to a list of valve IDs.
+    """
+    return [
+        valve_id for bit, valve_id in enumerate(relevant_ids) if mask & (0x01 << bit)
+    ]
+
+
+def get_compressed_label(valve_labels, vid):
+    """
+    Get the label for a valve in a compressed path.
+    """
+    if vid < 0:
+        return valve_labels[~vid] + "*"
+    return valve_labels[vid]
+
+
+def calc_distances(adj_matrix):
+    """
+    Calculate the shortest distance between every pair of valves
+    (Floyd-Warshall).
+    Returns a matrix of distances in minutes.
+    """
+    node_count = len(adj_matrix)
+    dist_matrix = [list(row) for row in adj_matrix]
+    for idx in range(node_count):
+        dist_matrix[idx][idx] = 0
+    for k in range(node_count):
+        row_k = dist_matrix[k]
+        for i in range(node_count):
+            row_i = dist_matrix[i]
+            dist_ik = row_i[k]
+            if dist_ik == sys.maxsize:
+                continue
+            for j in range(node_count):
+                dist_kj = row_k[j]
+                if dist_kj == sys.maxsize:
+                    continue
+                if dist_ik + dist_kj < row_i[j]:
+                    row_i[j] = dist_ik + dist_kj
+    dist_matrix = tuple(tuple(row) for row in dist_matrix)
+    return dist_matrix
 
 
 def create_adj_matrix(valves):
@@ -216,5 +986,64 @@ if __name__ == "__main__":
     parser.add_argument(
         "-e", "--elephant", action="store_true", help="Add an elephant helper."
     )
+    parser.add_argument(
+        "-a",
+        "--agents",
+        type=int,
+        help=(
+            "The number of cooperating agents (26 minutes if more than 1).  "
+            "More than 2 agents always use --disjoint."
+        ),
+    )
+    parser.add_argument(
+        "-z",
+        "--compress",
+        action="store_true",
+        help="Jump directly between valves with a positive flow rate.",
+    )
+    parser.add_argument(
+        "-b",
+        "--bound",
+        action="store_true",
+        help="Use a branch-and-bound search with an optimistic pressure bound.",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        help="Run the branch-and-bound search on WORKERS processes.",
+    )
+    parser.add_argument(
+        "--split-depth",
+        type=int,
+        choices=[1, 2],
+        default=2,
+        help="Split the parallel search after this many decisions.",
+    )
+    parser.add_argument(
+        "-d",
+        "--disjoint",
+        action="store_true",
+        help="Combine the best scores for disjoint sets of valves.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help="Store the --disjoint mask pressure tables in CACHE_DIR.",
+    )
+    parser.add_argument(
+        "--stats", action="store_true", help="Report search statistics."
+    )
+    parser.add_argument(
+        "--dp",
+        action="store_true",
+        help="Use the bottom-up DP table instead of a recursive search.",
+    )
+    parser.add_argument(
+        "--two-layers",
+        action="store_true",
+        help="Only keep 2 time layers of the DP table.",
+    )
     args = parser.parse_args()
+    if args.agents is not None and args.agents < 1:
+        parser.error("argument -a/--agents: must be at least 1")
     main(args)
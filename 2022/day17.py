@@ -1,7 +1,18 @@
 #! /usr/bin/env python
 
 import argparse
+import contextlib
+import csv
+import functools
 import itertools
+import json
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+import timeit
 
 shapes = [
     ["####"],
@@ -31,99 +42,211 @@ shapes = [
 def main(args):
     """
     The main function entrypoint.
+    Returns a summary of the run.
     """
+    if args.benchmark is not None:
+        run_benchmark(args)
+        return
+    start_time = timeit.default_timer()
+    cycle_seconds = None
     quiet = args.quiet
+    viewport = args.viewport
+    if viewport is not None:
+        # The viewport replaces the full chamber plots.
+        quiet = True
+        frame_every = args.frame_every
+        frame_batch = []
+        step = 0
     max_rocks = args.rocks
-    shape_genrator = itertools.cycle(shapes)
+    many_rocks = args.many_rocks
+    if many_rocks is not None:
+        print("Extrapolating for {} rocks ...".format(many_rocks))
+        max_rocks = many_rocks
+    queries = None
+    if args.queries is not None:
+        queries = list(parse_rock_counts(args.queries))
+        max_rocks = max(queries)
+    chamber_width = args.width
+    rock_shapes = shapes
+    if args.shapes is not None:
+        rock_shapes = list(parse_shapes(args.shapes))
+    shape_count = len(rock_shapes)
+    shape_genrator = itertools.cycle(compile_shapes(rock_shapes, chamber_width))
     gas_jets = list(parse_gas_jets(args.infile))
-    chamber_width = 7
     start_left_off = 2
     start_bottom_off = 3
+    for shape in rock_shapes:
+        if start_left_off + max(len(row) for row in shape) > chamber_width:
+            raise Exception(
+                "Shape does not fit in a chamber {} wide:\n{}".format(
+                    chamber_width, "\n".join(reversed(shape))
+                )
+            )
     chamber = []
+    # Absolute height of `chamber[0]`; rows below it can't be reached anymore.
+    chamber_offset = 0
+    trim_size = args.window if args.no_cycle else 0
     rock = None
     rock_height = 0
     tallest_rock_top = 0
     rock_count = 0
-    height_map = {}
+    # The height after each rock, for extrapolating from a cycle and for
+    # answering queries.  Plain --no-cycle runs only need the running height.
+    rock_heights = None
+    if not args.no_cycle or queries is not None:
+        rock_heights = [0]
+    seek_cycle = not args.no_cycle
+    seen_states = {}
+    cycle = None
     for jet_num, jet in itertools.cycle(enumerate(gas_jets)):
         if rock is None:
             rock = next(shape_genrator)
-            rock_height = len(rock)
+            rock_height = len(rock[0])
             rock_left = start_left_off
             rock_bottom = tallest_rock_top + start_bottom_off
             rock_top = rock_bottom + rock_height
-            while len(chamber) < rock_top:
-                chamber.append("." * chamber_width)
+            while chamber_offset + len(chamber) < rock_top:
+                chamber.append(0)
             if not quiet:
-                rock_composite = superimpose_rock_on_cavity(
-                    rock, rock_left, rock_bottom, chamber_width
-                )
+                rock_composite = superimpose_rock_on_cavity(rock, rock_left)
                 print("= NEW ROCK =")
-                plot_object(rock_composite)
+                plot_object(rock_composite, chamber_width)
                 print("")
                 print("= CHAMBER =")
-                plot_object(chamber)
+                plot_object(chamber, chamber_width)
                 print("")
         if jet == "<":
             new_left = rock_left - 1
         elif jet == ">":
             new_left = rock_left + 1
-        if not collision(chamber, chamber_width, rock, new_left, rock_bottom):
+        if not collision(chamber, rock, new_left, rock_bottom - chamber_offset):
             rock_left = new_left
         if not quiet:
-            rock_composite = superimpose_rock_on_cavity(
-                rock, rock_left, rock_bottom, chamber_width
-            )
+            rock_composite = superimpose_rock_on_cavity(rock, rock_left)
             print("==", "JET PUSHED ROCK:", jet, "==")
-            plot_object(rock_composite)
+            plot_object(rock_composite, chamber_width)
             print("")
         new_bottom = rock_bottom - 1
-        if not collision(chamber, chamber_width, rock, rock_left, new_bottom):
+        falling = not collision(chamber, rock, rock_left, new_bottom - chamber_offset)
+        if falling:
             rock_bottom = new_bottom
-        else:
-            place_rock_in_chamber(chamber, chamber_width, rock, rock_left, rock_bottom)
+        if viewport is not None:
+            step += 1
+            if step % frame_every == 0:
+                frame_batch.append(
+                    render_viewport(
+                        chamber,
+                        chamber_offset,
+                        rock,
+                        rock_left,
+                        rock_bottom,
+                        viewport,
+                        chamber_width,
+                        "step {} rock {} jet {} {}".format(
+                            step, rock_count + 1, jet_num, jet
+                        ),
+                    )
+                )
+                if len(frame_batch) >= args.frame_batch:
+                    args.frames.write("".join(frame_batch))
+                    frame_batch.clear()
+        if not falling:
+            place_rock_in_chamber(
+                chamber, rock, rock_left, rock_bottom - chamber_offset
+            )
             if not quiet:
                 print(
                     "ROCK {} COMES TO REST AT ({:6d},{:6d}).".format(
                         rock_count + 1, rock_left, rock_bottom
                     )
                 )
-                plot_object(chamber)
+                plot_object(chamber, chamber_width)
             rock = None
             rock_top = rock_bottom + rock_height
             if rock_top > tallest_rock_top:
                 tallest_rock_top = rock_top
             rock_count += 1
-            height_map[tallest_rock_top] = rock_count
+            if rock_heights is not None:
+                rock_heights.append(tallest_rock_top)
             if rock_count == max_rocks:
                 break
-    print("Highest rock at {}.".format(tallest_rock_top))
+            if seek_cycle and rock_count == args.cycle_limit:
+                if max_rocks > args.max_simulated:
+                    if len(seen_states) == 0:
+                        reason = "the rows rocks can reach never fit in {} rows"
+                        reason = reason.format(args.window)
+                    else:
+                        reason = "none of the {} recorded states repeated"
+                        reason = reason.format(len(seen_states))
+                    raise Exception(
+                        "No cycle detectable after {} rocks: {}.  {} rocks is "
+                        "more than the {} rocks plain simulation is allowed "
+                        "(--max-simulated).".format(
+                            rock_count, reason, max_rocks, args.max_simulated
+                        )
+                    )
+                # Give up on the cycle and simulate the remaining rocks.
+                seek_cycle = False
+                seen_states.clear()
+                if queries is None:
+                    rock_heights = None
+                trim_size = 2 * len(chamber) + args.window
+            if len(chamber) < trim_size:
+                continue
+            chamber_offset += trim_chamber(chamber, chamber_width)
+            trim_size = 2 * len(chamber) + args.window
+            surface_top = tallest_rock_top - chamber_offset
+            if not seek_cycle or surface_top > args.window:
+                continue
+            # While the reachable rows fit in the window, trim after every rock
+            # and use them, with the shape and the jet, as the cycle state.
+            trim_size = 0
+            state = (
+                (rock_count - 1) % shape_count,
+                jet_num,
+                tuple(chamber[:surface_top]),
+            )
+            prev_rock_count = seen_states.get(state)
+            if prev_rock_count is not None:
+                cycle = (prev_rock_count, rock_count)
+                cycle_seconds = timeit.default_timer() - start_time
+                break
+            seen_states[state] = rock_count
+    if viewport is not None:
+        args.frames.write("".join(frame_batch))
+        args.frames.flush()
+    summary = {
+        "rocks": max_rocks,
+        "simulated_rocks": rock_count,
+        "height": tallest_rock_top,
+        "cycle": cycle,
+        "cycle_seconds": cycle_seconds,
+    }
+    print("Simulated {} rocks, height {}.".format(rock_count, tallest_rock_top))
     jet_cycle_size = len(gas_jets)
     print("Jet cycle size:", jet_cycle_size)
-    # plot_object(chamber, segment_size=jet_cycle_size)
-    cycle_size = find_cycle(chamber)
-    cycle_start = find_first_cycle(chamber, cycle_size)
+    # plot_object(chamber, chamber_width, segment_size=jet_cycle_size)
+    if cycle is None:
+        print("No cycle found before the last rock.")
+        print("Total height:", tallest_rock_top)
+        if queries is not None:
+            write_query_heights(args.output, queries, rock_heights, None, None)
+        return summary
+    rock_cycle_start, rock_cycle_end = cycle
+    cycle_start = rock_heights[rock_cycle_start]
+    cycle_size = rock_heights[rock_cycle_end] - cycle_start
+    rock_cycle_size = rock_cycle_end - rock_cycle_start
     print("Cycle start:", cycle_start)
     print("Cycle size:", cycle_size)
-    rock_cycle_start = height_map[cycle_start]
-    rock_cycle_end = height_map[cycle_start + cycle_size]
-    rock_cycle_size = rock_cycle_end - rock_cycle_start
     print("Rock number associated with cycle start:", rock_cycle_start)
     print("Rock number associated with cycle end:", rock_cycle_end)
     print("Size of cycle in rocks:", rock_cycle_size)
     # print("- Rock cycle table -")
     cycle_offset_map = {}
-    for n in range(cycle_size):
-        height = n + cycle_start
-        rockno = height_map.get(height)
-        if rockno is not None:
-            rock_offset = rockno - rock_cycle_start
-            # print("Cycle offset {:8d}: rock offset {:8d}".format(n, rock_offset))
-            cycle_offset_map[rock_offset] = n
-    many_rocks = args.many_rocks
-    if many_rocks is not None:
-        print("Extrapolating for {} rocks ...".format(many_rocks))
-        max_rocks = many_rocks
+    for rock_offset in range(rock_cycle_size):
+        n = rock_heights[rock_cycle_start + rock_offset] - cycle_start
+        # print("Cycle offset {:8d}: rock offset {:8d}".format(n, rock_offset))
+        cycle_offset_map[rock_offset] = n
     leading_rocks = rock_cycle_start
     full_cycles = (max_rocks - leading_rocks) // rock_cycle_size
     print("Full cycles required:", full_cycles)
@@ -132,97 +255,253 @@ def main(args):
     trailing_height = cycle_offset_map[trailing_rocks]
     total_height = cycle_start + cycle_size * full_cycles + trailing_height
     print("Total height:", total_height)
-    # print("")
-    # print("- Rock cycle DEBUG table -")
-    # for height in range(len(chamber)):
-    #     rockno = height_map.get(height)
-    #     if rockno is not None:
-    #         print("Height {:8d}: rock number {:8d}".format(height, rockno))
-
-
-def find_first_cycle(chamber, cycle_size):
-    """
-    Find the first cycle.
-    """
-    segment = chamber[cycle_size:]
-    start_idx0 = None
-    count = 0
-    for rownum, (row, rowahead) in enumerate(zip(chamber, segment)):
-        if row == rowahead:
-            if start_idx0 is None:
-                start_idx0 = rownum
-            count += 1
-            if count == cycle_size:
-                return start_idx0
+    if queries is not None:
+        write_query_heights(args.output, queries, rock_heights, cycle, cycle_offset_map)
+    summary["height"] = total_height
+    return summary
+
+
+def run_benchmark(args):
+    """
+    Time the simulation for fixed rock counts on the example, the input, and
+    a seeded random jet string, and write the results as JSON.
+    Each case runs in a fresh process so its peak memory can be measured.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    rng = random.Random(args.seed)
+    jets = "".join(rng.choice("<>") for _ in range(args.bench_jets))
+    with tempfile.TemporaryDirectory() as tmpdir:
+        random_path = os.path.join(tmpdir, "random-{}.jets".format(args.seed))
+        with open(random_path, "w") as f:
+            f.write(jets)
+        inputs = [
+            ("day17.example", os.path.join(here, "day17.example")),
+            ("day17.input", os.path.join(here, "day17.input")),
+            ("random", random_path),
+        ]
+        cases = []
+        for name, path in inputs:
+            for rocks in args.bench_rocks:
+                for mode in ("cycle", "simulate"):
+                    cases.append((name, path, rocks, mode))
+        results = []
+        with multiprocessing.Pool(1, maxtasksperchild=1) as pool:
+            for name, path, rocks, mode in cases:
+                result = pool.apply(run_benchmark_case, (name, path, rocks, mode))
+                results.append(result)
+                cycle_seconds = result["cycle_seconds"]
+                print(
+                    "{:13s} {:8d} rocks {:8s} {:8.3f}s {:10.0f} rocks/s "
+                    "{:8d} KiB peak, cycle found {}".format(
+                        name,
+                        rocks,
+                        mode,
+                        result["seconds"],
+                        result["rocks_per_second"],
+                        result["peak_rss_kib"],
+                        (
+                            "-"
+                            if cycle_seconds is None
+                            else "{:.3f}s".format(cycle_seconds)
+                        ),
+                    )
+                )
+    report = {
+        "python": sys.version.split()[0],
+        "seed": args.seed,
+        "random_jets": args.bench_jets,
+        "results": results,
+    }
+    json.dump(report, args.benchmark, indent=2)
+    args.benchmark.write("\n")
+    args.benchmark.flush()
+
+
+def run_benchmark_case(name, path, rocks, mode):
+    """
+    Run one benchmark case with stdout silenced.
+    In "cycle" mode the run stops at the first cycle; in "simulate" mode every
+    rock is simulated.
+    """
+    argv = ["-q", "-r", str(rocks), path]
+    if mode == "simulate":
+        argv.insert(0, "--no-cycle")
+    args = parse_args(argv)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start_time = timeit.default_timer()
+        summary = main(args)
+        seconds = timeit.default_timer() - start_time
+    args.infile.close()
+    return {
+        "input": name,
+        "rocks": rocks,
+        "mode": mode,
+        "height": summary["height"],
+        "simulated_rocks": summary["simulated_rocks"],
+        "seconds": seconds,
+        "rocks_per_second": summary["simulated_rocks"] / seconds,
+        "cycle_seconds": summary["cycle_seconds"],
+        # ru_maxrss is in KiB on Linux.
+        "peak_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def render_viewport(
+    chamber, chamber_offset, rock, rock_left, rock_bottom, rows, chamber_width, label
+):
+    """
+    Render the `rows` rows of the chamber ending at the top of a falling rock.
+    The rock is drawn with `@`, and rows already trimmed from the chamber are
+    drawn with `~`.
+    Returns the frame as a single string.
+    """
+    rock_rows = rock[rock_left]
+    top = max(rock_bottom + len(rock_rows), rows)
+    lines = [label]
+    for y in range(top - 1, top - rows - 1, -1):
+        if y < chamber_offset:
+            lines.append("|" + "~" * chamber_width + "|")
+            continue
+        n = y - chamber_offset
+        line = row_to_str(chamber[n] if n < len(chamber) else 0, chamber_width)
+        rock_y = y - rock_bottom
+        if 0 <= rock_y < len(rock_rows):
+            rock_line = row_to_str(rock_rows[rock_y], chamber_width)
+            line = "".join("@" if r == "#" else c for c, r in zip(line, rock_line))
+        lines.append("|" + line + "|")
+    lines.append("+" + "-" * chamber_width + "+")
+    lines.append("")
+    return "\n".join(lines) + "\n"
+
+
+def write_query_heights(outfile, queries, rock_heights, cycle, cycle_offset_map):
+    """
+    Write the tower height for each queried rock count as CSV.
+    Counts that were simulated are looked up directly; larger counts are
+    extrapolated from the cycle.
+    """
+    writer = csv.writer(outfile)
+    writer.writerow(["rocks", "height"])
+    for rocks in queries:
+        if rocks < len(rock_heights):
+            height = rock_heights[rocks]
         else:
-            start_idx0 = None
-            count = 0
-    return None
-
-
-def find_cycle(chamber):
-    """ "
-    Analyze the chamber.
-    """
-    chamber_size = len(chamber)
-    sample_idx = chamber_size - 10
-    sample = chamber[sample_idx]
-    idx0 = sample_idx
-    start_match = None
-    for idx1 in range(idx0 - 1, 0, -1):
-        row = chamber[idx1]
-        if row == sample:
-            idx0 -= 1
-            if idx0 == start_match:
-                print("Found cycle from {} to {}.".format(start_match, sample_idx))
-                cycle_size = sample_idx - start_match
-                return cycle_size
-            sample = chamber[idx0]
-            if start_match is None:
-                start_match = idx1
+            height = extrapolate_height(rocks, rock_heights, cycle, cycle_offset_map)
+        writer.writerow([rocks, height])
+    outfile.flush()
+
+
+def extrapolate_height(rocks, rock_heights, cycle, cycle_offset_map):
+    """
+    Extrapolate the tower height after `rocks` rocks from a detected cycle.
+    """
+    rock_cycle_start, rock_cycle_end = cycle
+    cycle_start = rock_heights[rock_cycle_start]
+    cycle_size = rock_heights[rock_cycle_end] - cycle_start
+    rock_cycle_size = rock_cycle_end - rock_cycle_start
+    full_cycles, trailing_rocks = divmod(rocks - rock_cycle_start, rock_cycle_size)
+    return cycle_start + cycle_size * full_cycles + cycle_offset_map[trailing_rocks]
+
+
+def parse_rock_counts(infile):
+    """
+    Parse rock counts, one per line.
+    """
+    for line in infile:
+        line = line.strip()
+        if line == "":
+            continue
+        yield int(line)
+
+
+def trim_chamber(chamber, chamber_width):
+    """
+    Discard the rows at the bottom of the chamber that no falling rock can
+    reach.
+    A falling rock only moves left, right, and down, so the reachable cells
+    are found with a single pass from the top row down.  The row below the
+    lowest reachable row is kept because collisions are checked against it.
+    Returns the number of rows discarded.
+    """
+    reach = 0
+    lowest_reachable = len(chamber)
+    for y in range(len(chamber) - 1, -1, -1):
+        empty = ~chamber[y] & ((0x01 << chamber_width) - 1)
+        if y == len(chamber) - 1:
+            reach = empty
         else:
-            idx0 = sample_idx
-            sample = chamber[idx0]
-            start_match = None
-    return None
+            reach &= empty
+        while True:
+            spread = (reach | (reach << 1) | (reach >> 1)) & empty
+            if spread == reach:
+                break
+            reach = spread
+        if reach == 0:
+            break
+        lowest_reachable = y
+    trimmed = max(0, lowest_reachable - 1)
+    del chamber[:trimmed]
+    return trimmed
 
 
-def plot_object(thing, segment_size=None):
+def plot_object(thing, chamber_width, segment_size=None):
     """
-    Plot an object.
+    Plot an object made of row bitmasks.
     """
     print("")
     for n, row in enumerate(reversed(thing)):
         if segment_size is not None:
             if n % segment_size == 0:
                 print("-------")
-        print(row)
+        print(row_to_str(row, chamber_width))
     print("")
 
 
-def place_rock_in_chamber(chamber, chamber_width, rock, rock_left, rock_bottom):
+@functools.lru_cache(maxsize=4096)
+def row_to_str(row, chamber_width):
     """
-    Place a rock in the chamber.
+    Convert a row bitmask to a string.
+    The leftmost column is the most significant bit.
     """
-    rock_height = len(rock)
-    rock_top = rock_bottom + rock_height
-    section = chamber[rock_bottom:rock_top]
-    rock_composite = superimpose_rock_on_cavity(
-        rock, rock_left, rock_bottom, chamber_width
+    return "".join(
+        "#" if row & (0x01 << (chamber_width - 1 - col)) else "."
+        for col in range(chamber_width)
     )
-    new_section = []
-    for chamber_row, rock_row in zip(section, rock_composite):
-        new_row = []
-        for c0, c1 in zip(chamber_row, rock_row):
-            if c0 == "#" or c1 == "#":
-                new_row.append("#")
-            else:
-                new_row.append(".")
-        new_section.append("".join(new_row))
-    chamber[rock_bottom:rock_top] = new_section
 
 
-def collision(chamber, chamber_width, rock, rock_left, rock_bottom):
+def compile_shapes(shapes, chamber_width):
+    """
+    Compile each shape into row bitmasks for every left offset that fits in
+    the chamber.
+    Returns a list of shapes, where `shape[rock_left]` is a tuple of row
+    bitmasks from the bottom of the rock up.
+    """
+    compiled = []
+    for shape in shapes:
+        shape_width = max(len(row) for row in shape)
+        offsets = []
+        for rock_left in range(chamber_width - shape_width + 1):
+            rows = []
+            for shape_row in shape:
+                row = 0
+                for col, c in enumerate(shape_row):
+                    if c == "#":
+                        row |= 0x01 << (chamber_width - 1 - rock_left - col)
+                rows.append(row)
+            offsets.append(tuple(rows))
+        compiled.append(tuple(offsets))
+    return compiled
+
+
+def place_rock_in_chamber(chamber, rock, rock_left, rock_bottom):
+    """
+    Place a rock in the chamber.
+    """
+    for y, rock_row in enumerate(rock[rock_left], rock_bottom):
+        chamber[y] |= rock_row
+
+
+def collision(chamber, rock, rock_left, rock_bottom):
     """
     Returns True if the placement of a rock would collide with another rock in
     the chamber of the chamber's edge.
@@ -231,39 +510,40 @@ def collision(chamber, chamber_width, rock, rock_left, rock_bottom):
         return True
     if rock_bottom < 0:
         return True
-    rock_width = max(len(row) for row in rock)
-    if rock_left + rock_width - 1 >= chamber_width:
+    if rock_left >= len(rock):
         return True
-    rock_height = len(rock)
-    rock_top = rock_bottom + rock_height
-    rock_composite = superimpose_rock_on_cavity(
-        rock, rock_left, rock_bottom, chamber_width
-    )
-    section = chamber[rock_bottom:rock_top]
-    empty_row = "." * chamber_width
-    for chamber_row, rock_row in itertools.zip_longest(
-        section, rock_composite, fillvalue=empty_row
-    ):
-        for c0, c1 in zip(chamber_row, rock_row):
-            if c0 == "#" and c1 == "#":
-                return True
+    chamber_height = len(chamber)
+    for y, rock_row in enumerate(rock[rock_left], rock_bottom):
+        if y < chamber_height and chamber[y] & rock_row:
+            return True
     return False
 
 
-def superimpose_rock_on_cavity(rock, rock_left, rock_bottom, chamber_width):
+def superimpose_rock_on_cavity(rock, rock_left):
     """
     Superimpose a rock on an empty field the width of the chamber.
     """
-    empty_row = "." * chamber_width
-    rock_height = len(rock)
-    empty_field = [empty_row] * rock_height
-    rock_width = len(rock[0])
-    rock_right = rock_left + rock_width
-    composite = []
-    for row, rock_row in zip(empty_field, rock):
-        new_row = row[:rock_left] + rock_row + row[rock_right:]
-        composite.append(new_row)
-    return composite
+    return list(rock[rock_left])
+
+
+def parse_shapes(infile):
+    """
+    Parse rock shapes drawn as in the puzzle text, separated by blank lines.
+    Rows are drawn from the top down but are returned from the bottom up.
+    """
+    shape = []
+    for line in infile:
+        line = line.rstrip()
+        if line == "":
+            if len(shape) > 0:
+                yield list(reversed(shape))
+            shape = []
+            continue
+        if set(line) - set(".#"):
+            raise Exception("Unexpected line: {}".format(line))
+        shape.append(line)
+    if len(shape) > 0:
+        yield list(reversed(shape))
 
 
 def parse_gas_jets(infile):
@@ -275,14 +555,36 @@ def parse_gas_jets(infile):
         yield c
 
 
-if __name__ == "__main__":
+def parse_args(argv=None):
+    """
+    Parse the command line arguments.
+    """
     parser = argparse.ArgumentParser("Advent of Code 2022, day 17")
     parser.add_argument(
-        "infile", type=argparse.FileType("r"), action="store", help="The input file."
+        "infile",
+        type=argparse.FileType("r"),
+        nargs="?",
+        action="store",
+        help="The input file.",
     )
     parser.add_argument(
         "-r", "--rocks", type=int, default=2022, help="The number of rocks to count."
     )
+    parser.add_argument(
+        "--width",
+        type=int,
+        default=7,
+        help=(
+            "The width of the chamber, up to 64 columns.  With the puzzle's "
+            "shapes, 16 or more columns leave columns open to the floor, so "
+            "no cycle can be detected."
+        ),
+    )
+    parser.add_argument(
+        "--shapes",
+        type=argparse.FileType("r"),
+        help="Read the rock shapes from SHAPES instead of using the puzzle's.",
+    )
     parser.add_argument("-q", "--quiet", action="store_true", help="Be less chatty.")
     parser.add_argument(
         "-m",
@@ -290,5 +592,107 @@ if __name__ == "__main__":
         type=int,
         help="Calculate the height for MANY_ROCKS by extrapolating from the input.",
     )
-    args = parser.parse_args()
-    main(args)
+    parser.add_argument(
+        "-w",
+        "--window",
+        type=int,
+        default=64,
+        help="Trim unreachable rows once the chamber grows past WINDOW rows.",
+    )
+    parser.add_argument(
+        "--cycle-limit",
+        type=int,
+        default=1_000_000,
+        help="Stop looking for a cycle after CYCLE_LIMIT rocks.",
+    )
+    parser.add_argument(
+        "--max-simulated",
+        type=int,
+        default=10_000_000,
+        help=(
+            "Without a cycle, fail instead of simulating more than "
+            "MAX_SIMULATED rocks."
+        ),
+    )
+    parser.add_argument(
+        "--no-cycle",
+        action="store_true",
+        help="Simulate every rock instead of stopping at the first cycle.",
+    )
+    parser.add_argument(
+        "-v",
+        "--viewport",
+        type=int,
+        help="Render only VIEWPORT rows around the falling rock (implies -q).",
+    )
+    parser.add_argument(
+        "--frame-every",
+        type=int,
+        default=1,
+        help="Render one viewport frame every FRAME_EVERY jet pushes.",
+    )
+    parser.add_argument(
+        "--frame-batch",
+        type=int,
+        default=1,
+        help="Write viewport frames in batches of FRAME_BATCH.",
+    )
+    parser.add_argument(
+        "--frames",
+        type=argparse.FileType("w"),
+        default="-",
+        help="Write viewport frames to FRAMES (default: stdout).",
+    )
+    parser.add_argument(
+        "-Q",
+        "--queries",
+        type=argparse.FileType("r"),
+        help="Report the height for every rock count in QUERIES, one per line.",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=argparse.FileType("w"),
+        default="-",
+        help=(
+            "Write the CSV of query heights to OUTPUT (default: stdout, with "
+            "the report moved to stderr)."
+        ),
+    )
+    parser.add_argument(
+        "--benchmark",
+        type=argparse.FileType("w"),
+        help="Run the benchmark cases instead and write the results as JSON.",
+    )
+    parser.add_argument(
+        "--bench-rocks",
+        type=int,
+        nargs="+",
+        default=[2022, 100_000, 1_000_000],
+        help="The rock counts to benchmark.",
+    )
+    parser.add_argument(
+        "--bench-jets",
+        type=int,
+        default=10_000,
+        help="The length of the random jet string to benchmark.",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=17, help="The seed for the random jet string."
+    )
+    args = parser.parse_args(argv)
+    if args.infile is None and args.benchmark is None:
+        parser.error("the following arguments are required: infile")
+    if not 1 <= args.width <= 64:
+        parser.error("argument --width: must be between 1 and 64")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.queries is not None and args.output is sys.stdout:
+        # Keep stdout a clean CSV; the report goes to stderr instead.
+        with contextlib.redirect_stdout(sys.stderr):
+            main(args)
+    else:
+        main(args)
@@ -2,27 +2,66 @@
 
 import argparse
 import collections
+import concurrent.futures
+import itertools
+import timeit
+
+import numpy as np
+
+# Bits per robot or resource count in a packed state.
+FIELD_BITS = 16
+FIELD_MASK = (0x01 << FIELD_BITS) - 1
+# Robots take the low four fields of a packed state, resources the high four,
+# and the geode count is the most significant field.
+RESOURCE_SHIFT = 4 * FIELD_BITS
+ROBOT_MASK = (0x01 << RESOURCE_SHIFT) - 1
+GEODE_SHIFT = 7 * FIELD_BITS
+# Bits for the time left in a cache key.
+TIME_BITS = 6
+# Estimated bytes per cache entry: a packed key of about 44 bytes plus the
+# dict's hash table and index slots.  Values are mostly shared between entries.
+CACHE_ENTRY_BYTES = 120
+# How many preceding rows each sort-and-scan dominance pass compares against.
+DOMINANCE_WINDOW = 8
+# Check the clock for progress reports once every this many states.
+PROGRESS_CHECK_MASK = 0x3FF
 
 
 def main(args):
     """
     The main function entrypoint.
     """
-    max_time = args.max_time
+    max_times = sorted(args.max_time)
+    recursive = not args.frontier and (args.beam is None or args.compare)
+    # The recursive search packs the time left into TIME_BITS of its keys.
+    if recursive and max_times[-1] >= 0x01 << TIME_BITS:
+        raise Exception(
+            "Maximum time must be below {} minutes.".format(0x01 << TIME_BITS)
+        )
     max_blueprints = args.max_blueprints
+    if max_blueprints is None:
+        max_blueprints = [None]
+    if len(max_blueprints) == 1:
+        max_blueprints = max_blueprints * len(max_times)
+    elif len(max_blueprints) != len(max_times):
+        raise Exception("Give one --max-blueprints value or one per horizon.")
+    # Pair the limits with the horizons in the order they were given.
+    blueprint_limits = dict(zip(args.max_time, max_blueprints))
     no_quality = args.no_quality
     blueprints = parse_blueprints(args.infile)
     blueprints = dict(blueprints)
-    total_quality = 0
-    geode_product = 1
+    selected = []
+    optimized_blueprints = []
+    resource_caps = []
+    horizons = []
     for bpnum, (label, blueprint) in enumerate(blueprints.items()):
-        if max_blueprints is not None and bpnum == max_blueprints:
-            break
-        bid = int(label.split()[-1])
-        print_heading("Blueprint", "=")
-        print_blueprint(label, blueprint)
-        robots = [1, 0, 0, 0]
-        resources = [0, 0, 0, 0]
+        bp_horizons = tuple(
+            max_time
+            for max_time in max_times
+            if blueprint_limits[max_time] is None or bpnum < blueprint_limits[max_time]
+        )
+        if len(bp_horizons) == 0:
+            continue
         res_caps = calc_resource_caps(blueprint)
         res_caps_tuple = (
             res_caps["ore"],
@@ -30,33 +69,353 @@ def main(args):
             res_caps["obsidian"],
             res_caps["geode"],
         )
-        optimized_blueprint = blueprint_to_tuple(blueprint)
-        cache = {}
+        selected.append((label, blueprint))
+        optimized_blueprints.append(blueprint_to_tuple(blueprint))
+        resource_caps.append(res_caps_tuple)
+        horizons.append(bp_horizons)
+    if args.workers is None:
+        executor = None
+        map_blueprints = map
+    else:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=args.workers)
+        # `map` yields the results in blueprint order.
+        map_blueprints = executor.map
+    exact_results = None
+    beam_results = None
+    if args.frontier and (args.beam is None or args.compare):
+        exact_results = map_blueprints(
+            solve_horizons,
+            itertools.repeat(frontier_search_blueprint),
+            optimized_blueprints,
+            resource_caps,
+            horizons,
+            itertools.repeat((not args.no_skip,)),
+        )
+    elif recursive:
+        # The recursive search shares one cache between the horizons itself.
+        exact_results = map_blueprints(
+            solve_blueprint,
+            optimized_blueprints,
+            resource_caps,
+            horizons,
+            itertools.repeat(not args.no_bound),
+            itertools.repeat(args.cache_bytes),
+            itertools.repeat(args.progress),
+            [label for label, _ in selected],
+        )
+    if args.beam is not None:
+        beam_results = map_blueprints(
+            solve_horizons,
+            itertools.repeat(beam_search_blueprint),
+            optimized_blueprints,
+            resource_caps,
+            horizons,
+            itertools.repeat((args.beam,)),
+        )
+    if beam_results is None:
+        results = exact_results
+        exact_results = itertools.repeat(None)
+    else:
+        results = beam_results
+        if exact_results is None:
+            exact_results = itertools.repeat(None)
+    total_quality = collections.Counter()
+    geode_product = collections.defaultdict(lambda: 1)
+    exact_quality = collections.Counter()
+    exact_product = collections.defaultdict(lambda: 1)
+    total_pruned = 0
+    total_skipped = 0
+    for (label, blueprint), bp_horizons, bp_results, bp_exact in zip(
+        selected, horizons, results, exact_results
+    ):
+        bid = int(label.split()[-1])
+        print_heading("Blueprint", "=")
+        print_blueprint(label, blueprint)
+        if bp_exact is None:
+            bp_exact = itertools.repeat(None)
+        for max_time, (robots, resources, stats), exact in zip(
+            bp_horizons, bp_results, bp_exact
+        ):
+            if len(max_times) > 1:
+                print_heading("{} minutes".format(max_time), '"')
+            geodes = resources[3]
+            print_counter("Robots", robots)
+            print_counter("Resources", resources)
+            quality = bid * geodes
+            total_quality[max_time] += quality
+            geode_product[max_time] *= geodes
+            if not no_quality:
+                print("Blueprint quality:", quality)
+            print("States pruned:", stats["pruned"])
+            if stats["evicted"] > 0:
+                print("Cache entries evicted:", stats["evicted"])
+            if "reused" in stats:
+                print("Cache entries carried over:", stats["carried_over"])
+                print("Cache hits on carried-over entries:", stats["reused"])
+            if "peak_frontier" in stats:
+                print("States skipped (could have built earlier):", stats["skipped"])
+                total_skipped += stats["skipped"]
+                print("Peak frontier size:", stats["peak_frontier"])
+            total_pruned += stats["pruned"]
+            if exact is not None:
+                exact_geodes = exact[1][3]
+                print(
+                    "Beam search geodes: {} (exact: {}, {:+d})".format(
+                        geodes, exact_geodes, geodes - exact_geodes
+                    )
+                )
+                exact_quality[max_time] += bid * exact_geodes
+                exact_product[max_time] *= exact_geodes
+            print("")
+    if executor is not None:
+        executor.shutdown()
+    for max_time in max_times:
+        suffix = ""
+        if len(max_times) > 1:
+            suffix = " ({} minutes)".format(max_time)
+        if not no_quality:
+            print("Total quality{}:".format(suffix), total_quality[max_time])
+        print("Geode product{}:".format(suffix), geode_product[max_time])
+        if args.beam is not None and args.compare:
+            if not no_quality:
+                print("Exact total quality{}:".format(suffix), exact_quality[max_time])
+            print("Exact geode product{}:".format(suffix), exact_product[max_time])
+    print("Total states pruned:", total_pruned)
+    if args.frontier:
+        print("Total states skipped (could have built earlier):", total_skipped)
+
+
+def solve_horizons(solver, blueprint, resource_caps, max_times, solver_args):
+    """
+    Run `solver` on a blueprint once for each horizon in `max_times`.
+    """
+    return [
+        solver(blueprint, resource_caps, max_time, *solver_args)
+        for max_time in max_times
+    ]
+
+
+def solve_blueprint(
+    blueprint,
+    resource_caps,
+    max_times,
+    bound=True,
+    cache_bytes=1 << 30,
+    progress=None,
+    label="",
+):
+    """
+    Find the most geodes a blueprint can produce in each of the `max_times`
+    minutes, from the shortest horizon to the longest.
+    `blueprint` is in the tuple format from `blueprint_to_tuple()`.
+    If `bound` is set, branches that can't beat the best geode count found so
+    far are pruned.  The cache is limited to about `cache_bytes` bytes.
+    If `progress` is set, a progress line prefixed with `label` is printed
+    every `progress` seconds.
+
+    Cache keys hold the time left rather than the time elapsed, so one cache
+    serves every horizon.  Each longer horizon starts with the previous
+    answer, plus waiting out the extra minutes, as its incumbent.  Cached
+    results that pruning left short can't beat that incumbent either, so
+    they stay safe to reuse.
+
+    Returns a list of (robots, resources, stats), one per horizon.
+    """
+    cache = StateCache(cache_bytes // CACHE_ENTRY_BYTES)
+    results = []
+    seed = None
+    for max_time in sorted(max_times):
+        now = timeit.default_timer()
+        stats = {
+            "bound": bound,
+            "best_geodes": 0,
+            "pruned": 0,
+            "states": 0,
+            "min_time": max_time,
+            "max_time": max_time,
+            "progress": progress,
+            "label": "{} ({} min)".format(label, max_time),
+            "start_time": now,
+            "last_report": (now, 0),
+        }
+        if seed is not None:
+            prev_time, prev_packed = seed
+            # Doing nothing for the extra minutes keeps the previous answer.
+            seed = prev_packed + (
+                (max_time - prev_time) * (prev_packed & ROBOT_MASK) << RESOURCE_SHIFT
+            )
+            stats["best_geodes"] = seed >> GEODE_SHIFT
+            stats["carried_over"] = len(cache)
+            cache.carry_over()
+        evicted = cache.evicted
         try:
-            robots, resources = evaluate_blueprint(
+            packed = evaluate_blueprint(
                 cache=cache,
+                stats=stats,
                 time=max_time,
-                blueprint=optimized_blueprint,
-                robots=robots,
-                resources=resources,
-                resource_caps=res_caps_tuple,
-                earlier_optimization=0b000,
+                blueprint=blueprint,
+                robots=[1, 0, 0, 0],
+                resources=[0, 0, 0, 0],
+                resource_caps=resource_caps,
             )
         except KeyboardInterrupt:
             print("Cache size:", len(cache))
             raise
-        geodes = resources[3]
-        print_counter("Robots", robots)
-        print_counter("Resources", resources)
-        quality = bid * geodes
-        total_quality += quality
-        geode_product *= geodes
-        if not no_quality:
-            print("Blueprint quality:", quality)
-        print("")
-    if not no_quality:
-        print("Total quality:", total_quality)
-    print("Geode product:", geode_product)
+        if seed is not None and packed >> GEODE_SHIFT < seed >> GEODE_SHIFT:
+            packed = seed
+        stats["evicted"] = cache.evicted - evicted
+        if seed is not None:
+            stats["reused"] = cache.reused
+        robots, resources = unpack_state(packed)
+        results.append((robots, resources, stats))
+        seed = (max_time, packed)
+    return results
+
+
+def beam_search_blueprint(blueprint, resource_caps, max_time, width):
+    """
+    Estimate the most geodes a blueprint can produce with a beam search.
+    The search goes forward one minute at a time and keeps only the `width`
+    most promising states, ranked by geodes, then geode robots, then
+    obsidian, so it takes O(max_time * width) steps but may miss the optimum.
+
+    Returns (robots, resources, stats)
+    """
+    beam = [((1, 0, 0, 0), (0, 0, 0, 0))]
+    stats = {"pruned": 0, "evicted": 0}
+    for time in range(max_time, 0, -1):
+        next_states = set()
+        for robots, resources in beam:
+            collected = tuple(qty + n for qty, n in zip(resources, robots))
+            next_states.add((robots, collected))
+            # No point in producing anything other than geode robots in the
+            # last minute.
+            choices = (3,) if time == 1 else (3, 2, 1, 0)
+            for restype in choices:
+                cap = resource_caps[restype]
+                if cap != 0 and robots[restype] >= cap:
+                    continue
+                costs = blueprint[restype]
+                if any(qty < cost for qty, cost in zip(resources, costs)):
+                    continue
+                new_robots = list(robots)
+                new_robots[restype] += 1
+                new_resources = tuple(qty - cost for qty, cost in zip(collected, costs))
+                next_states.add((tuple(new_robots), new_resources))
+        beam = sorted(next_states, key=rank_beam_state, reverse=True)
+        stats["pruned"] += max(0, len(beam) - width)
+        del beam[width:]
+    robots, resources = beam[0]
+    return list(robots), list(resources), stats
+
+
+def frontier_search_blueprint(blueprint, resource_caps, max_time, skip=True):
+    """
+    Find the most geodes a blueprint can produce with a breadth-first search
+    over NumPy arrays.
+    Each minute's frontier is an array of shape (states, 9) holding the robot
+    counts, the resource counts, and a bitmap of the robots that were
+    affordable when the state waited instead of building.  Building one of
+    those right after waiting is skipped: building it a minute earlier is
+    always at least as good.  All build choices are expanded for the whole
+    frontier at once, then duplicate, hopeless, and dominated states are
+    removed, so memory is bounded by the frontier size.
+    If `skip` is False, robots that could have been built earlier aren't
+    skipped.
+
+    Returns (robots, resources, stats)
+    """
+    costs = np.array(blueprint, dtype=np.int32)
+    caps = np.array(resource_caps, dtype=np.int32)
+    frontier = np.array([[1, 0, 0, 0, 0, 0, 0, 0, 0]], dtype=np.int32)
+    stats = {"pruned": 0, "evicted": 0, "skipped": 0, "peak_frontier": 1}
+    for time in range(max_time, 0, -1):
+        robots = frontier[:, :4]
+        resources = frontier[:, 4:8]
+        skipped = frontier[:, 8]
+        waiting = frontier.copy()
+        waiting[:, 4:8] += robots
+        waiting[:, 8] = 0
+        expanded = [waiting]
+        # No point in producing anything other than geode robots in the last
+        # minute.
+        choices = (3,) if time == 1 else (3, 2, 1, 0)
+        for restype in choices:
+            can_build = np.all(resources >= costs[restype], axis=1)
+            if caps[restype] != 0:
+                can_build &= robots[:, restype] < caps[restype]
+            if skip:
+                waiting[can_build, 8] |= 0x01 << restype
+                could_have_built = (skipped & (0x01 << restype)) != 0
+                stats["skipped"] += np.count_nonzero(can_build & could_have_built)
+                can_build &= ~could_have_built
+            built = frontier[can_build]
+            built[:, 4:8] += built[:, :4] - costs[restype]
+            built[:, restype] += 1
+            built[:, 8] = 0
+            expanded.append(built)
+        frontier = np.concatenate(expanded)
+        remaining_time = time - 1
+        # Throw away extra resources: at most `cap` can be spent per minute.
+        capped = caps[:3] != 0
+        frontier[:, 4:7][:, capped] = np.minimum(
+            frontier[:, 4:7][:, capped], caps[:3][capped] * remaining_time
+        )
+        frontier = np.unique(frontier, axis=0)
+        expanded_size = len(frontier)
+        # Drop states that can't beat the best geode count guaranteed so far,
+        # even building a geode robot every remaining minute.
+        geodes = frontier[:, 7] + frontier[:, 3] * remaining_time
+        best_geodes = geodes.max()
+        triangle = remaining_time * (remaining_time - 1) // 2
+        frontier = frontier[geodes + triangle >= best_geodes]
+        frontier = remove_dominated(frontier)
+        stats["pruned"] += expanded_size - len(frontier)
+        stats["peak_frontier"] = max(stats["peak_frontier"], expanded_size)
+    best = frontier[np.argmax(frontier[:, 7])]
+    return best[:4].tolist(), best[4:8].tolist(), stats
+
+
+def remove_dominated(frontier):
+    """
+    Remove states that another state matches or beats on every robot and
+    resource count, with no more skipped robots.
+    A full dominance check is quadratic, so this sorts the states in
+    descending order and compares each one against the `DOMINANCE_WINDOW`
+    states before it, once with robots first and once with resources first.
+    Only dominated states are removed, so the search stays exact.
+    The states must be unique.
+    """
+    for columns in ((0, 1, 2, 3, 4, 5, 6, 7), (4, 5, 6, 7, 0, 1, 2, 3)):
+        # `np.lexsort` sorts by its last key first; fewer skipped robots
+        # sort first among otherwise equal states.
+        keys = [frontier[:, 8]] + [-frontier[:, n] for n in reversed(columns)]
+        frontier = frontier[np.lexsort(keys)]
+        dominated = np.zeros(len(frontier), dtype=bool)
+        for offset in range(1, DOMINANCE_WINDOW + 1):
+            later = frontier[offset:]
+            earlier = frontier[:-offset]
+            dominated[offset:] |= np.all(later[:, :8] <= earlier[:, :8], axis=1) & (
+                earlier[:, 8] & ~later[:, 8] == 0
+            )
+        frontier = frontier[~dominated]
+    return frontier
+
+
+def rank_beam_state(state):
+    """
+    The beam search heuristic: geodes, then geode robots, then obsidian,
+    then the remaining robots from the most to the least valuable.
+    """
+    robots, resources = state
+    return (
+        resources[3],
+        robots[3],
+        resources[2],
+        robots[2],
+        robots[1],
+        robots[0],
+    )
 
 
 def blueprint_to_tuple(blueprint):
@@ -113,34 +472,51 @@ def calc_resource_caps(blueprint):
 
 def evaluate_blueprint(
     cache,
+    stats,
     time,
     blueprint,
     robots,
     resources,
     resource_caps,
-    earlier_optimization,
 ):
     """
     Evaluate a blueprint.
+    Each branch jumps straight to the minute its robot becomes affordable, so
+    no branch waits and then builds a robot it could have built before the
+    wait.  The "could have built it earlier" skip needs no flags here.
+    `stats["best_geodes"]` is the incumbent: the most geodes any branch is
+    known to reach.  Branches that can't beat it are pruned if
+    `stats["bound"]` is set.
 
-    Returns (robots, resources)
+    Returns the final (robots, resources) packed by `pack_state()`.
     """
     # print("time:", time, ", robots:", robots, ", resources:", resources)
     if time == 0:
-        return robots, resources
+        return pack_state(robots, resources)
 
-    cache_key = (time, *tuple(robots), *tuple(resources), earlier_optimization)
+    state = pack_state(robots, resources)
+    cache_key = state << TIME_BITS | time
     cached = cache.get(cache_key)
     if cached is not None:
         return cached
 
-    winner = (
-        list(robots),
-        [
-            resource_count + robot_count * time
-            for robot_count, resource_count in zip(robots, resources)
-        ],
-    )
+    stats["states"] += 1
+    if time < stats["min_time"]:
+        stats["min_time"] = time
+    if stats["progress"] is not None and stats["states"] & PROGRESS_CHECK_MASK == 0:
+        report_progress(stats, cache)
+
+    # Doing nothing: every robot adds its output to the matching resource.
+    winner = state + (time * (state & ROBOT_MASK) << RESOURCE_SHIFT)
+
+    geodes = winner >> GEODE_SHIFT
+    if geodes > stats["best_geodes"]:
+        stats["best_geodes"] = geodes
+    # Even building a geode robot every remaining minute can't beat the
+    # incumbent.
+    if stats["bound"] and geodes + time * (time - 1) // 2 <= stats["best_geodes"]:
+        stats["pruned"] += 1
+        return winner
 
     # Choose which resource to produce.
     choices = [3, 2, 1, 0]
@@ -170,13 +546,6 @@ def evaluate_blueprint(
             # We've maxed out this resource production.
             continue
 
-        if restype == 0 and (earlier_optimization & 0x001) != 0:
-            continue
-        if restype == 1 and (earlier_optimization & 0x010) != 0:
-            continue
-        if restype == 2 and (earlier_optimization & 0x100) != 0:
-            continue
-
         costs = blueprint[restype]
         time_to_build = 0
         for resource_on_hand, resource_required, robot_count in zip(
@@ -207,34 +576,128 @@ def evaluate_blueprint(
         new_resources = tmp_resources
 
         # Get results from the future.
-        bitmap = 0b000
-        if restype is None:
-            if possible_lst[0]:
-                bitmap |= 0b001
-            if possible_lst[1]:
-                bitmap |= 0b010
-            if possible_lst[2]:
-                bitmap |= 0b100
         future_results = evaluate_blueprint(
             cache=cache,
+            stats=stats,
             time=remaining_time,
             blueprint=blueprint,
             robots=new_robots,
             resources=new_resources,
             resource_caps=resource_caps,
-            earlier_optimization=bitmap,
         )
-        a0, a1 = winner
-        b0, b1 = future_results
-        if b1[3] >= a1[3]:
+        if future_results >> GEODE_SHIFT >= winner >> GEODE_SHIFT:
             winner = future_results
 
-    if len(cache) == 35_776_709:
-        cache.clear()
-    cache[cache_key] = winner
+    cache.put(cache_key, winner)
     return winner
 
 
+def report_progress(stats, cache):
+    """
+    Print a progress line if `stats["progress"]` seconds have passed since the
+    last one.
+    """
+    now = timeit.default_timer()
+    last_time, last_states = stats["last_report"]
+    elapsed = now - last_time
+    if elapsed < stats["progress"]:
+        return
+    states_per_second = (stats["states"] - last_states) / elapsed
+    stats["last_report"] = (now, stats["states"])
+    print(
+        "{} {:7.1f}s: {:9.0f} states/s, cache {} entries (~{:.0f} MiB), "
+        "best {} geodes, depth {}/{}".format(
+            stats["label"],
+            now - stats["start_time"],
+            states_per_second,
+            len(cache),
+            len(cache) * CACHE_ENTRY_BYTES / (1 << 20),
+            stats["best_geodes"],
+            stats["max_time"] - stats["min_time"],
+            stats["max_time"],
+        ),
+        flush=True,
+    )
+
+
+class StateCache:
+    """
+    A cache of search results bounded to `max_size` entries.
+    It approximates LRU with two generations: new entries go into the young
+    generation, and when that is full the old generation is dropped and the
+    young one takes its place.  Hits in the old generation are copied back
+    into the young one, so entries in use survive.
+    Unlike moving entries to the end of a single dict, this never deletes
+    keys, so the dicts don't grow past what their entries need.
+    After `carry_over()`, hits on the entries that were already cached are
+    counted in `reused`.
+    """
+
+    def __init__(self, max_size):
+        self.generation_size = max(1, max_size // 2)
+        self.young = {}
+        self.old = {}
+        self.evicted = 0
+        self.carried = None
+        self.reused = 0
+
+    def carry_over(self):
+        """
+        Start counting hits on the entries cached so far.
+        """
+        self.carried = set(self.young)
+        self.carried.update(self.old)
+        self.reused = 0
+
+    def __len__(self):
+        return len(self.young) + len(self.old)
+
+    def get(self, key):
+        value = self.young.get(key)
+        if value is None:
+            value = self.old.get(key)
+            if value is not None:
+                self.put(key, value)
+        if value is not None and self.carried is not None and key in self.carried:
+            self.reused += 1
+        return value
+
+    def put(self, key, value):
+        if len(self.young) >= self.generation_size:
+            self.evicted += len(self.old)
+            self.old = self.young
+            self.young = {}
+        self.young[key] = value
+
+
+def pack_state(robots, resources):
+    """
+    Pack robot and resource counts into a single int, with the geode count
+    in the most significant field.
+    """
+    packed = resources[3]
+    packed = (packed << FIELD_BITS) | resources[2]
+    packed = (packed << FIELD_BITS) | resources[1]
+    packed = (packed << FIELD_BITS) | resources[0]
+    packed = (packed << FIELD_BITS) | robots[3]
+    packed = (packed << FIELD_BITS) | robots[2]
+    packed = (packed << FIELD_BITS) | robots[1]
+    return (packed << FIELD_BITS) | robots[0]
+
+
+def unpack_state(packed):
+    """
+    Unpack the robot and resource counts packed by `pack_state()`.
+
+    Returns (robots, resources)
+    """
+    fields = []
+    for _ in range(8):
+        fields.append(packed & FIELD_MASK)
+        packed >>= FIELD_BITS
+    return fields[:4], fields[4:]
+
+
 def print_heading(heading, symbol="-"):
     """
     Print a heading.
@@ -269,6 +732,13 @@ def print_counters(title, counters):
     print("")
 
 
+def parse_int_list(text):
+    """
+    Parse a comma-separated list of integers.
+    """
+    return [int(part) for part in text.split(",")]
+
+
 def parse_blueprints(infile):
     """
     Generator yields blueprints from input file.
@@ -304,10 +774,65 @@ if __name__ == "__main__":
     parser.add_argument(
         "infile", type=argparse.FileType("r"), action="store", help="The input file."
     )
-    parser.add_argument("-t", "--max-time", type=int, default=24, help="Maximum time.")
-    parser.add_argument("-b", "--max-blueprints", type=int, help="Max. blueprints.")
+    parser.add_argument(
+        "-t",
+        "--max-time",
+        type=parse_int_list,
+        default=[24],
+        help="Maximum time.  Give several, like 24,32, to solve each in one run.",
+    )
+    parser.add_argument(
+        "-b",
+        "--max-blueprints",
+        type=parse_int_list,
+        help="Max. blueprints, either for every horizon or one per horizon.",
+    )
     parser.add_argument(
         "--no-quality", action="store_true", help="Don't show quality levels."
     )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        help="Evaluate the blueprints on WORKERS processes.",
+    )
+    parser.add_argument(
+        "--no-bound",
+        action="store_true",
+        help="Don't prune branches against the best geode count so far.",
+    )
+    parser.add_argument(
+        "--cache-bytes",
+        type=int,
+        default=1 << 30,
+        help="Evict cache entries beyond roughly CACHE_BYTES bytes per blueprint.",
+    )
+    parser.add_argument(
+        "--frontier",
+        action="store_true",
+        help="Use the breadth-first NumPy search instead of the recursive one.",
+    )
+    parser.add_argument(
+        "--no-skip",
+        action="store_true",
+        help="With --frontier, don't skip robots that could have been built earlier.",
+    )
+    parser.add_argument(
+        "--beam",
+        type=int,
+        metavar="W",
+        help="Use a beam search keeping the W best states per minute.",
+    )
+    parser.add_argument(
+        "--compare",
+        action="store_true",
+        help="With --beam, also run the exact search and compare the results.",
+    )
+    parser.add_argument(
+        "--progress",
+        type=float,
+        metavar="SECONDS",
+        help="Print a progress line every SECONDS during the recursive search.",
+    )
     args = parser.parse_args()
     main(args)